@@ -6,7 +6,10 @@ Production-ready Flask application with yt-dlp integration
 import os
 import sys
 import logging
+import logging.handlers
+import atexit
 from datetime import datetime
+from types import MappingProxyType
 from typing import Dict, Tuple, Optional
 from pathlib import Path
 
@@ -15,19 +18,28 @@ if sys.platform == "win32":
     import io
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
 
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, send_file, make_response
+from flask.json.provider import JSONProvider
 from werkzeug.utils import secure_filename
 from flask_cors import CORS
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 import yt_dlp
-from urllib.parse import urlparse
 from http.client import HTTPException
 import time
 import threading
 import uuid
 import queue as _queue
+from collections import OrderedDict, deque
 import json
+import hashlib
+import copy
+import shutil
+import re
+import unicodedata
+from urllib.parse import quote, urlsplit, parse_qsl, urlencode
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 try:
     from waitress import serve
@@ -35,31 +47,86 @@ try:
 except ImportError:
     HAS_WAITRESS = False
 
+try:
+    import redis
+    HAS_REDIS = True
+except ImportError:
+    HAS_REDIS = False
+
+try:
+    import diskcache
+    HAS_DISKCACHE = True
+except ImportError:
+    HAS_DISKCACHE = False
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
 # ============================================================================
 # Configuration & Setup
 # ============================================================================
 
 app = Flask(__name__)
 
+
+if HAS_ORJSON:
+    class OrjsonProvider(JSONProvider):
+        """jsonify()/request.get_json() backed by orjson."""
+        _OPTIONS = orjson.OPT_NON_STR_KEYS
+
+        def dumps(self, obj, **kwargs) -> str:
+            return orjson.dumps(obj, default=str, option=self._OPTIONS).decode('utf-8')
+
+        def loads(self, s, **kwargs):
+            return orjson.loads(s)
+
+        def response(self, *args, **kwargs):
+            # Skip the bytes -> str -> bytes round trip of the base implementation
+            obj = self._prepare_response_obj(args, kwargs)
+            return self._app.response_class(orjson.dumps(obj, default=str, option=self._OPTIONS),
+                                            mimetype='application/json')
+
+    app.json = OrjsonProvider(app)
+
 # Enable CORS
 CORS(app, resources={r"/api/*": {"origins": "*"}})
 
-# Initialize rate limiter
+# Initialize rate limiter. Counters must be shared for the limits to hold
+# across gunicorn workers/replicas, so they live in Redis whenever it's there.
 limiter = Limiter(
     app=app,
     key_func=get_remote_address,
     default_limits=["200 per day", "50 per hour"],
-    storage_uri="memory://"
+    storage_uri=os.environ.get('RATELIMIT_STORAGE_URI')
+    or (os.environ.get('REDIS_URL') if HAS_REDIS else None)
+    or "memory://",
+    strategy="moving-window"
 )
 
-# Configure logging
+# Configure logging. Request threads only enqueue records; a listener thread
+# formats them and does the (possibly slow) stdout/file writes.
+_log_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+_log_targets = [logging.StreamHandler(sys.stdout)]
+if os.environ.get('LOG_FILE'):
+    _log_targets.append(logging.FileHandler(os.environ['LOG_FILE'], encoding='utf-8'))
+for _handler in _log_targets:
+    _handler.setFormatter(_log_formatter)
+
+_log_queue = _queue.Queue(-1)
 logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=os.environ.get('LOG_LEVEL', 'INFO').upper(),
+    # The QueueHandler only renders the message; the targets add the rest
+    format='%(message)s',
     handlers=[
-        logging.StreamHandler(sys.stdout)
+        logging.handlers.QueueHandler(_log_queue)
     ]
 )
+_log_listener = logging.handlers.QueueListener(_log_queue, *_log_targets, respect_handler_level=True)
+_log_listener.start()
+atexit.register(_log_listener.stop)
 logger = logging.getLogger(__name__)
 
 # Directories
@@ -67,11 +134,31 @@ BASE_DIR = Path(__file__).parent
 DOWNLOADS_DIR = BASE_DIR / "downloads"
 DOWNLOADS_DIR.mkdir(exist_ok=True)
 
+# yt-dlp writes .part files and pre-merge/pre-conversion streams here and only
+# moves the finished file into DOWNLOADS_DIR (a rename on the same filesystem)
+TEMP_DIR = Path(os.environ.get('TEMP_DIR', BASE_DIR / 'temp'))
+TEMP_DIR.mkdir(parents=True, exist_ok=True)
+
 # Frontend directory (optional serving of static frontend files)
 FRONTEND_DIR = BASE_DIR.parent / 'frontend'
 
+# When set (e.g. '/internal/'), /api/file responses only carry an
+# X-Accel-Redirect header and nginx streams the file itself via sendfile.
+# Only requests nginx marks with "X-Sendfile-Type: X-Accel-Redirect" get one;
+# clients reaching the app directly (port 5000) are sent the file as usual.
+X_ACCEL_PREFIX = os.environ.get('X_ACCEL_PREFIX')
+# Same idea for Apache (mod_xsendfile) / lighttpd: send_file only sets X-Sendfile
+app.config['USE_X_SENDFILE'] = os.environ.get('USE_X_SENDFILE', '').lower() in ('1', 'true', 'yes')
+
 # Optional cookies file (Netscape cookie file / cookies.txt)
 COOKIES_FILE = BASE_DIR / 'cookies.txt'
+_COOKIES_FILE_STR = str(COOKIES_FILE)
+# Checked on every yt-dlp call; only the cookies routes below change it
+_cookies_present = COOKIES_FILE.exists()
+
+# yt-dlp cache (player JS, signature functions), kept across restarts
+YTDLP_CACHE_DIR = BASE_DIR / '.ytdlp-cache'
+YTDLP_CACHE_DIR.mkdir(exist_ok=True)
 
 # Common user-agents to rotate if a request fails
 USER_AGENTS = [
@@ -88,103 +175,520 @@ except Exception:
     logger.debug("Could not determine yt-dlp version")
 
 
+# yt-dlp format selectors per requested MP4 quality
+QUALITY_MAP = MappingProxyType({
+    '1080': 'bestvideo[height<=1080]+bestaudio/best[height<=1080]',
+    '720': 'bestvideo[height<=720]+bestaudio/best[height<=720]',
+    '360': 'bestvideo[height<=360]+bestaudio/best[height<=360]',
+    'best': 'bestvideo+bestaudio/best',
+})
+MP3_POSTPROCESSOR = MappingProxyType({
+    'key': 'FFmpegExtractAudio',
+    'preferredcodec': 'mp3',
+    'preferredquality': '192',
+})
+
+# Concurrent fragment downloads for segmented media (DASH/HLS)
+CONCURRENT_FRAGMENTS = int(os.environ.get('CONCURRENT_FRAGMENTS', '4'))
+# Progressive downloads are fetched in ranged chunks of this size, which
+# sidesteps YouTube's per-connection throttling of long single requests
+HTTP_CHUNK_SIZE = int(os.environ.get('HTTP_CHUNK_SIZE', str(10 * 1024 * 1024)))
+
+# Optionally hand progressive (plain HTTP) downloads to aria2c's parallel
+# connections; HLS/DASH keep yt-dlp's native fragment downloader
+USE_ARIA2 = os.environ.get('USE_ARIA2', '').lower() in ('1', 'true', 'yes') and shutil.which('aria2c') is not None
+ARIA2_ARGS = ['-x', '16', '-s', '16', '-k', '1M', '--min-split-size=1M', '--file-allocation=none']
+
 CONFIG = {
     'MAX_DURATION': 3600,
     'MAX_FILE_SIZE': 5 * 1024 * 1024 * 1024,
     'SUPPORTED_FORMATS': ['mp4', 'mp3'],
     'FILE_RETENTION_HOURS': 24,
+    'CLEANUP_INTERVAL': int(os.environ.get('CLEANUP_INTERVAL_SECONDS', '3600')),
+    'META_CACHE_TTL': 24 * 3600,
+    'PLAYLIST_CACHE_TTL': 3600,
 }
 
+# Metadata cache: Redis when REDIS_URL is set, otherwise a local disk cache
+REDIS_URL = os.environ.get('REDIS_URL')
+redis_client = redis.Redis.from_url(REDIS_URL) if HAS_REDIS and REDIS_URL else None
+disk_cache = diskcache.Cache(str(BASE_DIR / '.cache')) if redis_client is None and HAS_DISKCACHE else None
+
 # ============================================================================
 # Utility Functions
 # ============================================================================
 
+# http(s) URL whose host is youtube.com / youtu.be or one of their subdomains
+_YT_URL_RE = re.compile(r'^https?://(?:[\w-]+\.)*(?:youtube\.com|youtu\.be)(?::\d+)?(?:[/?#]|$)', re.IGNORECASE)
+
+# Bounds the regex work (and cache key size) for hostile input; real share
+# links with playlist/index/tracking parameters stay far below this
+MAX_URL_LENGTH = 2048
+
 def validate_youtube_url(url: str) -> bool:
-    try:
-        parsed = urlparse(url)
-        hostname = parsed.hostname or ""
-        return any(domain in hostname.lower() for domain in ['youtube.com', 'youtu.be'])
-    except:
-        return False
+    return isinstance(url, str) and len(url) <= MAX_URL_LENGTH and _YT_URL_RE.match(url) is not None
+
+# Query parameters that select what a YouTube URL points at; everything else
+# (si=, feature=, utm_*, t=, ...) is tracking or playback state
+_CANONICAL_PARAMS = ('v', 'list')
+
+def canonical_url(url: str) -> str:
+    """Normalize a YouTube URL for use as a cache key."""
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    for prefix in ('www.', 'm.', 'music.'):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+            break
+    path = parts.path.rstrip('/')
+    query = [(k, v) for k, v in parse_qsl(parts.query) if k in _CANONICAL_PARAMS]
+    if host == 'youtu.be' and path:
+        # Short links are the same video as watch?v=<id>
+        host, query, path = 'youtube.com', query + [('v', path[1:])], '/watch'
+    query.sort()
+    return f"https://{host}{path}" + (f"?{urlencode(query)}" if query else '')
+
+# Path traversal / separators / NUL / line breaks (which would end up in the
+# Content-Disposition header), rejected in a single scan
+_UNSAFE_FILENAME_RE = re.compile(r'\.\.|[/\\\x00\r\n]')
 
 def is_safe_filename(filename: str) -> bool:
-    dangerous_chars = ['..', '/', '\\', '\0']
-    return not any(char in filename for char in dangerous_chars)
+    return _UNSAFE_FILENAME_RE.search(filename) is None
+
+_SIZE_UNITS = ('B', 'KB', 'MB', 'GB', 'TB')
 
 def format_size(bytes_size: int) -> str:
-    for unit in ['B', 'KB', 'MB', 'GB']:
-        if bytes_size < 1024.0:
-            return f"{bytes_size:.2f} {unit}"
-        bytes_size /= 1024.0
-    return f"{bytes_size:.2f} TB"
+    # Each unit is 10 more bits, so the bit length picks it without a loop
+    i = min(len(_SIZE_UNITS) - 1, (max(int(bytes_size), 1).bit_length() - 1) // 10)
+    return f"{bytes_size / (1 << (10 * i)):.2f} {_SIZE_UNITS[i]}"
+
+def subtitle_languages(info: Dict) -> Dict[str, Dict[str, bool]]:
+    # Uploaded and automatic captions, merged over the union of language codes
+    manual = info.get('subtitles') or {}
+    auto = info.get('automatic_captions') or {}
+    return {lang: {'manual': lang in manual, 'automatic': lang in auto}
+            for lang in manual.keys() | auto.keys()}
+
+# ============================================================================
+# Cache
+# ============================================================================
+
+def cache_key(prefix: str, url: str) -> str:
+    return prefix + hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+_CACHE_STATS = {'hits': 0, 'misses': 0}
+_CACHE_STATS_LOCK = threading.Lock()
+
+def record_cache_lookup(kind: str, url: str, hit: bool):
+    with _CACHE_STATS_LOCK:
+        _CACHE_STATS['hits' if hit else 'misses'] += 1
+        hits, misses = _CACHE_STATS['hits'], _CACHE_STATS['misses']
+    logger.info('%s cache %s for %s (hits=%d, misses=%d)', kind, 'hit' if hit else 'miss', url, hits, misses)
+
+def cache_get(key: str):
+    try:
+        if redis_client is not None:
+            raw = redis_client.get(key)
+            return json.loads(raw) if raw else None
+        if disk_cache is not None:
+            return disk_cache.get(key)
+    except Exception as e:
+        logger.warning('Cache read failed for %s: %s', key, repr(e))
+    return None
+
+def cache_set(key: str, value, ttl: int):
+    try:
+        if redis_client is not None:
+            redis_client.setex(key, ttl, json.dumps(value))
+        elif disk_cache is not None:
+            disk_cache.set(key, value, expire=ttl)
+    except Exception as e:
+        logger.warning('Cache write failed for %s: %s', key, repr(e))
+
+def cache_delete(key: str):
+    try:
+        if redis_client is not None:
+            redis_client.delete(key)
+        elif disk_cache is not None:
+            disk_cache.delete(key)
+    except Exception as e:
+        logger.warning('Cache delete failed for %s: %s', key, repr(e))
+
+# Per-key single-flight locks: Redis SET NX when shared, local Events otherwise
+_FLIGHTS: Dict[str, threading.Event] = {}
+_FLIGHTS_LOCK = threading.Lock()
+
+def singleflight_acquire(lock_key: str, owner: str, ttl: int) -> bool:
+    """Try to become the single worker for lock_key; False if someone else is."""
+    if redis_client is not None:
+        return bool(redis_client.set(lock_key, owner, nx=True, ex=ttl))
+    with _FLIGHTS_LOCK:
+        if lock_key in _FLIGHTS:
+            return False
+        _FLIGHTS[lock_key] = threading.Event()
+        return True
+
+def singleflight_release(lock_key: str, owner: str):
+    if redis_client is not None:
+        try:
+            if redis_client.get(lock_key) == owner.encode('utf-8'):
+                redis_client.delete(lock_key)
+        except Exception as e:
+            logger.warning('Failed to release lock %s: %s', lock_key, repr(e))
+        return
+    with _FLIGHTS_LOCK:
+        event = _FLIGHTS.pop(lock_key, None)
+    if event:
+        event.set()
+
+def singleflight_refresh(lock_key: str, owner: str, ttl: int):
+    """Push back the expiry of a lock owner still holds (local locks never expire)."""
+    if redis_client is None:
+        return
+    try:
+        if redis_client.get(lock_key) == owner.encode('utf-8'):
+            redis_client.expire(lock_key, ttl)
+    except Exception as e:
+        logger.warning('Failed to refresh lock %s: %s', lock_key, repr(e))
+
+def singleflight_wait(lock_key: str, result_key: str, timeout: float):
+    """Wait for the lock holder to publish result_key; None if it never does."""
+    if redis_client is None:
+        with _FLIGHTS_LOCK:
+            event = _FLIGHTS.get(lock_key)
+        if event:
+            event.wait(timeout)
+        return cache_get(result_key)
+
+    deadline = time.monotonic() + timeout
+    delay = 0.25
+    while time.monotonic() < deadline:
+        result = cache_get(result_key)
+        if result is not None:
+            return result
+        if not redis_client.exists(lock_key):
+            # Holder finished (or died) without publishing a result
+            return cache_get(result_key)
+        time.sleep(delay)
+        delay = min(delay * 2, 5)
+    return None
 
 # ============================================================================
 # Core Logic
 # ============================================================================
 
-# Simple in-memory job queue and event system (for demo/dev)
+# Job state: Redis hashes when shared (survives restarts and is visible to
+# every worker), otherwise a simple in-memory dict (for demo/dev)
 JOBS = {}
 JOBS_LOCK = threading.Lock()
-EVENT_QUEUE = _queue.Queue()
+JOB_KEY_PREFIX = 'ytdl:job:'
+JOB_INDEX_KEY = 'ytdl:jobs'
+
+def _encode_job(fields: Dict) -> Dict:
+    return {k: json.dumps(v) for k, v in fields.items()}
+
+def _decode_job(raw: Dict) -> Dict:
+    return {k.decode('utf-8'): json.loads(v) for k, v in raw.items()}
+
+def save_job(job: Dict):
+    if redis_client is not None:
+        key = JOB_KEY_PREFIX + job['id']
+        pipe = redis_client.pipeline()
+        pipe.hset(key, mapping=_encode_job(job))
+        pipe.expire(key, CONFIG['FILE_RETENTION_HOURS'] * 3600)
+        pipe.sadd(JOB_INDEX_KEY, job['id'])
+        pipe.execute()
+        return
+    with JOBS_LOCK:
+        JOBS[job['id']] = job
+
+def load_job(job_id: str) -> Optional[Dict]:
+    if redis_client is not None:
+        raw = redis_client.hgetall(JOB_KEY_PREFIX + job_id)
+        return _decode_job(raw) if raw else None
+    with JOBS_LOCK:
+        job = JOBS.get(job_id)
+        return dict(job) if job else None
+
+def update_job(job_id: str, **fields) -> bool:
+    """Set fields on an existing job; False if the job is unknown."""
+    if redis_client is not None:
+        key = JOB_KEY_PREFIX + job_id
+        pipe = redis_client.pipeline()
+        pipe.exists(key)
+        pipe.hset(key, mapping=_encode_job(fields))
+        pipe.expire(key, CONFIG['FILE_RETENTION_HOURS'] * 3600)
+        existed = pipe.execute()[0]
+        if not existed:
+            # Job expired or never existed: don't leave a partial hash behind
+            redis_client.delete(key)
+        return bool(existed)
+    with JOBS_LOCK:
+        job = JOBS.get(job_id)
+        if not job:
+            return False
+        job.update(fields)
+        return True
+
+def transition_job(job_id: str, from_statuses: Tuple[str, ...], **fields) -> Optional[bool]:
+    """Atomically set fields if the job's status is one of from_statuses.
+
+    Returns True if applied, False if the job is in another state, None if unknown.
+    """
+    if redis_client is not None:
+        # WATCH/MULTI/EXEC compare-and-set: the write is dropped (and retried)
+        # if anyone touched the job between reading its status and setting it
+        key = JOB_KEY_PREFIX + job_id
+        with redis_client.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(key)
+                    raw = pipe.hget(key, 'status')
+                    if raw is None:
+                        return None
+                    if json.loads(raw) not in from_statuses:
+                        return False
+                    pipe.multi()
+                    pipe.hset(key, mapping=_encode_job(fields))
+                    pipe.execute()
+                    return True
+                except redis.WatchError:
+                    continue
+    with JOBS_LOCK:
+        job = JOBS.get(job_id)
+        if not job:
+            return None
+        if job.get('status') not in from_statuses:
+            return False
+        job.update(fields)
+        return True
+
+def load_jobs() -> list:
+    if redis_client is not None:
+        ids = [i.decode('utf-8') for i in redis_client.smembers(JOB_INDEX_KEY)]
+        pipe = redis_client.pipeline()
+        for job_id in ids:
+            pipe.hgetall(JOB_KEY_PREFIX + job_id)
+        jobs = []
+        expired = []
+        for job_id, raw in zip(ids, pipe.execute()):
+            if raw:
+                jobs.append(_decode_job(raw))
+            else:
+                expired.append(job_id)
+        if expired:
+            redis_client.srem(JOB_INDEX_KEY, *expired)
+        return jobs
+    with JOBS_LOCK:
+        return [dict(j) for j in JOBS.values()]
+
+# Jobs are submitted straight to a pool of download workers
+EXECUTOR = ThreadPoolExecutor(max_workers=int(os.environ.get('DOWNLOAD_WORKERS', '4')), thread_name_prefix='download')
+
+# Metadata lookups are I/O bound on YouTube, so bulk enqueues fan them out
+META_POOL = ThreadPoolExecutor(max_workers=int(os.environ.get('META_WORKERS', '16')), thread_name_prefix='meta')
+
+# Per-entry enrichment of /api/expand listings; kept small so one big playlist
+# doesn't trip YouTube's rate limits
+EXPAND_POOL = ThreadPoolExecutor(max_workers=int(os.environ.get('EXPAND_PARALLELISM', '8')), thread_name_prefix='expand')
+
+# Events fan out to every SSE client: over Redis pub/sub when shared (so all
+# workers see them), otherwise to one in-process queue per connected client
+EVENT_CHANNEL = 'ytdl:events'
+SUBSCRIBERS = []
+SUBSCRIBERS_LOCK = threading.Lock()
+
+# Recent events are kept so reconnecting clients can resume from Last-Event-ID
+EVENT_RING_KEY = 'ytdl:events:ring'
+EVENT_SEQ_KEY = 'ytdl:events:seq'
+EVENT_RING_SIZE = 1000
+EVENT_RING = deque(maxlen=EVENT_RING_SIZE)
+_EVENT_SEQ = 0
+
+# Idle SSE connections get a comment frame this often so proxies keep them open
+HEARTBEAT_INTERVAL = 15
+HEARTBEAT_FRAME = b':\n\n'
+
+# Frames arriving close together (progress ticks from parallel jobs) are
+# written to a client as one chunk: up to SSE_BATCH_MAX frames, waiting at
+# most SSE_BATCH_WINDOW seconds after the first one
+SSE_BATCH_WINDOW = float(os.environ.get('SSE_BATCH_WINDOW', '0.02'))
+SSE_BATCH_MAX = 32
+
+# JSON straight to/from bytes (orjson when installed). Events are serialized
+# once per event, not once per subscriber.
+if HAS_ORJSON:
+    fast_dumps = orjson.dumps
+    fast_loads = orjson.loads
+else:
+    def fast_dumps(obj) -> bytes:
+        return json.dumps(obj).encode('utf-8')
+    fast_loads = json.loads
+
+
+def _event_frame(event_id: int, payload: bytes) -> bytes:
+    return b'id: %d\ndata: %s\n\n' % (event_id, payload)
+
+
+def _frame_id(frame: bytes) -> int:
+    return int(frame[4:frame.index(b'\n')])
+
 
 def push_event(event: dict):
+    global _EVENT_SEQ
+    payload = fast_dumps(event)
+    if redis_client is not None:
+        try:
+            frame = _event_frame(redis_client.incr(EVENT_SEQ_KEY), payload)
+            pipe = redis_client.pipeline()
+            pipe.lpush(EVENT_RING_KEY, frame)
+            pipe.ltrim(EVENT_RING_KEY, 0, EVENT_RING_SIZE - 1)
+            pipe.publish(EVENT_CHANNEL, frame)
+            pipe.execute()
+        except Exception as e:
+            logger.warning('Failed to publish event: %s', repr(e))
+        return
+
+    with SUBSCRIBERS_LOCK:
+        _EVENT_SEQ += 1
+        frame = _event_frame(_EVENT_SEQ, payload)
+        EVENT_RING.append(frame)
+        subscribers = list(SUBSCRIBERS)
+    for q in subscribers:
+        try:
+            q.put_nowait(frame)
+        except _queue.Full:
+            logger.warning('SSE client is not keeping up; dropping %s event', event.get('type'))
+
+
+def has_subscribers() -> bool:
+    # Redis subscribers may live in other workers, so always publish there
+    if redis_client is not None:
+        return True
+    with SUBSCRIBERS_LOCK:
+        return bool(SUBSCRIBERS)
+
+
+# Long-lived YoutubeDL instances keyed by their options. Constructing one loads
+# every extractor and starts with a cold player-JS cache, so instances are
+# reused; each one is checked out by a single job at a time. Options include
+# request-controlled values (subtitle languages), so both the number of
+# option sets (least recently used evicted) and idle instances per set are capped.
+YDL_POOL_KEYS = int(os.environ.get('YDL_POOL_KEYS', '16'))
+YDL_POOL_PER_KEY = int(os.environ.get('YDL_POOL_PER_KEY', '4'))
+_YDL_POOL: 'OrderedDict[str, list]' = OrderedDict()
+_YDL_POOL_LOCK = threading.Lock()
+# Bumped by clear_ydl_pool(); instances checked out before that are closed on return
+_ydl_pool_generation = 0
+
+def _ydl_progress(ydl, d):
+    if ydl.job_id:
+        _progress_hook(ydl.job_id, d)
+
+def final_file_path(ydl, info: Dict) -> str:
+    """Path of the file a finished extract_info(download=True) produced."""
+    # yt-dlp updates these entries after postprocessing (audio extraction,
+    # merging) and after moving the file from paths.temp into paths.home
+    downloads = info.get('requested_downloads')
+    if downloads and downloads[-1].get('filepath'):
+        return downloads[-1]['filepath']
+    return ydl.prepare_filename(info)
+
+@contextmanager
+def pooled_ydl(opts: Dict, job_id: Optional[str] = None):
+    """Check out a YoutubeDL for opts; progress is reported against job_id."""
+    key = json.dumps(opts, sort_keys=True, default=repr)
+    with _YDL_POOL_LOCK:
+        generation = _ydl_pool_generation
+        idle = _YDL_POOL.get(key)
+        ydl = idle.pop() if idle else None
+    if ydl is None:
+        ydl = yt_dlp.YoutubeDL(copy.deepcopy(opts))
+        ydl.add_progress_hook(lambda d, ydl=ydl: _ydl_progress(ydl, d))
+
+    ydl.job_id = job_id
     try:
-        EVENT_QUEUE.put_nowait(event)
+        yield ydl
     except Exception:
-        logger.debug('Event queue full or closed')
+        # Don't hand a possibly half-broken instance to the next job
+        _close_ydls([ydl], save_cookies=generation == _ydl_pool_generation)
+        raise
+    ydl.job_id = None
+    stale = False
+    discard = []
+    with _YDL_POOL_LOCK:
+        idle = _YDL_POOL.setdefault(key, [])
+        _YDL_POOL.move_to_end(key)
+        if generation != _ydl_pool_generation:
+            stale = True
+        elif len(idle) >= YDL_POOL_PER_KEY:
+            discard.append(ydl)
+        else:
+            idle.append(ydl)
+        while len(_YDL_POOL) > YDL_POOL_KEYS:
+            discard.extend(_YDL_POOL.popitem(last=False)[1])
+    if stale:
+        _close_ydls([ydl], save_cookies=False)
+    _close_ydls(discard)
+
+def _close_ydls(instances, save_cookies: bool = True):
+    for ydl in instances:
+        if not save_cookies:
+            # close() writes the in-memory jar back to cookiefile, which would
+            # undo a cookies upload or recreate a deleted cookies.txt
+            ydl.params['cookiefile'] = None
+        try:
+            ydl.close()
+        except Exception as e:
+            logger.debug('Failed to close YoutubeDL: %s', repr(e))
+
+def clear_ydl_pool():
+    """Drop pooled instances, e.g. after cookies.txt changed."""
+    global _ydl_pool_generation
+    with _YDL_POOL_LOCK:
+        _ydl_pool_generation += 1
+        pooled = [ydl for idle in _YDL_POOL.values() for ydl in idle]
+        _YDL_POOL.clear()
+    _close_ydls(pooled, save_cookies=False)
 
 
 def get_video_info_from_yt_dlp(url: str) -> Optional[Dict]:
     try:
-        # Base options used for metadata fetch
-        base_opts = {
+        # Options used for metadata fetch. Transient API errors are retried by
+        # yt-dlp itself (extractor_retries), which reuses the same session.
+        opts = {
             'quiet': True,
             'no_warnings': True,
             'skip_download': True,
             'socket_timeout': 15,
+            'extractor_retries': 2,
+            'cachedir': str(YTDLP_CACHE_DIR),
             'http_headers': {
-                'Referer': 'https://www.youtube.com/'
+                'Referer': 'https://www.youtube.com/',
+                'User-Agent': USER_AGENTS[0],
             }
         }
 
-        if COOKIES_FILE.exists():
-            base_opts['cookiefile'] = str(COOKIES_FILE)
-
-        info = None
-        # Try multiple attempts rotating user-agent to reduce transient API errors
-        for attempt in range(3):
-            ua = USER_AGENTS[attempt % len(USER_AGENTS)]
-            opts = dict(base_opts)
-            opts['http_headers'] = dict(base_opts.get('http_headers', {}))
-            opts['http_headers']['User-Agent'] = ua
+        if _cookies_present:
+            opts['cookiefile'] = _COOKIES_FILE_STR
 
-            try:
-                with yt_dlp.YoutubeDL(opts) as ydl:
-                    info = ydl.extract_info(url, download=False)
-                    break
-            except Exception as e:
-                logger.warning('Info attempt %d failed: %s', attempt + 1, repr(e))
-                time.sleep(1 + attempt)
+        with pooled_ydl(opts) as ydl:
+            info = ydl.extract_info(url, download=False)
 
         if not info:
-            logger.error('Failed to fetch video info after multiple attempts')
+            logger.error('Failed to fetch video info')
             return None
 
-        formats = []
+        # One entry per (height, ext), keeping the highest-bitrate variant
+        best = {}
         for f in info.get('formats', []):
             if f.get('vcodec') != 'none' and f.get('height'):
-                formats.append({
-                    'format_id': f.get('format_id'),
-                    'height': f.get('height'),
-                    'ext': f.get('ext'),
-                })
-
-        # Collect available subtitles (both uploaded and automatic)
-        subtitles = {}
-        for k, v in (info.get('subtitles') or {}).items():
-            subtitles.setdefault(k, {})['manual'] = True
-        for k, v in (info.get('automatic_captions') or {}).items():
-            subtitles.setdefault(k, {})['automatic'] = True
+                key = (f['height'], f.get('ext'))
+                if key not in best or (f.get('tbr') or 0) > (best[key].get('tbr') or 0):
+                    best[key] = f
+        formats = [{'format_id': f.get('format_id'), 'height': f['height'], 'ext': f.get('ext')} for f in best.values()]
+
+        subtitles = subtitle_languages(info)
 
         return {
             'title': info.get('title', 'Unknown'),
@@ -199,232 +703,517 @@ def get_video_info_from_yt_dlp(url: str) -> Optional[Dict]:
         logger.error('Info error: %s', repr(e))
         return None
 
-def download_video_with_yt_dlp(url: str, format_type: str, quality: str = 'best', include_subs: bool = False, subs_langs: Optional[list] = None) -> Optional[Tuple[str, str]]:
+# Per-process hot tier in front of the shared metadata cache. Entries are kept
+# as serialized JSON so every caller gets its own dict, and the TTL bucket
+# stored with each entry stops a long-lived worker from serving it forever.
+# A plain OrderedDict rather than lru_cache so a forced refresh can drop one URL.
+META_LRU_SIZE = int(os.environ.get('META_LRU', '1024'))
+_META_LRU = OrderedDict()  # canonical url -> (ttl_bucket, serialized info)
+_META_LRU_LOCK = threading.Lock()
+
+def _hot_video_info(url: str, ttl_bucket: int) -> bytes:
+    with _META_LRU_LOCK:
+        entry = _META_LRU.get(url)
+        if entry is not None and entry[0] == ttl_bucket:
+            _META_LRU.move_to_end(url)
+            return entry[1]
+    info = cache_get(cache_key('ytmeta:', url))
+    if info is None:
+        # Misses aren't stored, so they are retried next time
+        raise LookupError(url)
+    blob = fast_dumps(info)
+    with _META_LRU_LOCK:
+        _META_LRU[url] = (ttl_bucket, blob)
+        _META_LRU.move_to_end(url)
+        while len(_META_LRU) > META_LRU_SIZE:
+            _META_LRU.popitem(last=False)
+    return blob
+
+def forget_hot_video_info(url: Optional[str] = None) -> None:
+    """Drop one canonical URL from the hot tier, or all of it when url is None."""
+    with _META_LRU_LOCK:
+        if url is None:
+            _META_LRU.clear()
+        else:
+            _META_LRU.pop(url, None)
+
+def cached_meta(url: str) -> Optional[Dict]:
+    """Metadata from the hot tier or shared cache only; None on a miss."""
     try:
-        # Define output template
-        out_tmpl = str(DOWNLOADS_DIR / '%(title)s.%(ext)s')
-        
-        # Base options with common headers and timeouts to avoid 403 errors
-        base_opts = {
-            'outtmpl': out_tmpl,
-            'socket_timeout': 30,
-            'http_headers': {
-                'Referer': 'https://www.youtube.com/'
-            }
-        }
+        return fast_loads(_hot_video_info(canonical_url(url), int(time.time() // CONFIG['META_CACHE_TTL'])))
+    except LookupError:
+        return None
 
-        if COOKIES_FILE.exists():
-            base_opts['cookiefile'] = str(COOKIES_FILE)
-
-        # Add concurrency optimizations for fragment downloads (helps DASH/HLS)
-        concurrent_fragments = int(os.environ.get('CONCURRENT_FRAGMENTS', '4'))
-
-        if format_type == 'mp3':
-            ydl_opts = {
-                **base_opts,
-                'format': 'bestaudio/best',
-                'postprocessors': [{
-                    'key': 'FFmpegExtractAudio',
-                    'preferredcodec': 'mp3',
-                    'preferredquality': '192',
-                }],
-            }
+
+def _fetch_video_info(url: str) -> Optional[Dict]:
+    record_cache_lookup('Metadata', url, hit=False)
+    key = cache_key('ytmeta:', canonical_url(url))
+    # Concurrent lookups of the same video share one extraction
+    lock_key = 'meta:lock:' + key[len('ytmeta:'):]
+    owner = uuid.uuid4().hex
+    if not singleflight_acquire(lock_key, owner, 120):
+        info = singleflight_wait(lock_key, key, 120)
+        if info is not None:
+            return info
+        # The other lookup failed (or there is no cache to hand the result over)
+        return get_video_info_from_yt_dlp(url)
+
+    try:
+        info = get_video_info_from_yt_dlp(url)
+        if info:
+            cache_set(key, info, CONFIG['META_CACHE_TTL'])
+            # Otherwise a forced refresh would keep serving the old entry here
+            forget_hot_video_info(canonical_url(url))
+        return info
+    finally:
+        singleflight_release(lock_key, owner)
+
+
+def cached_video_info(url: str, force_refresh: bool = False) -> Optional[Dict]:
+    """Return video metadata, serving repeat lookups from the metadata cache."""
+    info = None if force_refresh else cached_meta(url)
+    if info is not None:
+        record_cache_lookup('Metadata', url, hit=True)
+        return info
+    return _fetch_video_info(url)
+
+
+def cached_video_infos(urls: list) -> list:
+    """Metadata for several URLs (None for failures); cache misses are fetched in parallel."""
+    metas = [cached_meta(u) for u in urls]
+    misses = [i for i, meta in enumerate(metas) if meta is None]
+    for url, meta in zip(urls, metas):
+        if meta is not None:
+            record_cache_lookup('Metadata', url, hit=True)
+    for i, meta in zip(misses, META_POOL.map(_fetch_video_info, [urls[i] for i in misses])):
+        metas[i] = meta
+    return metas
+
+
+def _entry_url(entry: Dict) -> Optional[str]:
+    if entry.get('webpage_url'):
+        return entry['webpage_url']
+    # Flat video entries only carry the id (and sometimes a bare url)
+    if entry.get('ie_key') == 'Youtube' and entry.get('id'):
+        return f"https://www.youtube.com/watch?v={entry['id']}"
+    return entry.get('url')
+
+
+def get_playlist_entries(url: str, max_items: int, force_refresh: bool = False) -> list:
+    """Return up to max_items entries of a playlist/channel URL, cached for a short TTL."""
+    key = cache_key('ytpl:', f'{canonical_url(url)}|{max_items}')
+    entries = None if force_refresh else cache_get(key)
+    record_cache_lookup('Playlist', url, hit=entries is not None)
+    if entries is not None:
+        return entries
+
+    # extract_flat lists the entries without resolving every video's metadata,
+    # and playlistend lets yt-dlp stop paging once max_items are listed
+    opts = {'quiet': True, 'skip_download': True, 'extract_flat': 'in_playlist', 'playlistend': max_items,
+            'cachedir': str(YTDLP_CACHE_DIR)}
+    with pooled_ydl(opts) as ydl:
+        info = ydl.extract_info(url, download=False)
+    entries = [{
+        'url': _entry_url(e),
+        'title': e.get('title'),
+        'thumbnail': e.get('thumbnail') or ((e.get('thumbnails') or [{}])[-1]).get('url'),
+        'duration': e.get('duration'),
+    } for e in (info.get('entries') or []) if e]
+    if entries:
+        cache_set(key, entries, CONFIG['PLAYLIST_CACHE_TTL'])
+    return entries
+
+
+def enrich_entries(entries: list) -> list:
+    """Fill flat playlist entries in with full video metadata, fetched in parallel."""
+    def merge(entry, meta):
+        entry['title'] = entry.get('title') or meta.get('title')
+        entry['thumbnail'] = entry.get('thumbnail') or meta.get('thumbnail_url')
+        entry['duration'] = entry.get('duration') or meta.get('duration')
+        entry['channel_name'] = meta.get('channel_name')
+        entry['formats'] = meta.get('formats')
+
+    pending = {}
+    for entry in entries:
+        if not entry.get('url'):
+            continue
+        meta = cached_meta(entry['url'])
+        if meta is not None:
+            merge(entry, meta)
         else:
-            # For MP4, quality mapping
-            quality_map = {
-                '1080': 'bestvideo[height<=1080]+bestaudio/best[height<=1080]',
-                '720': 'bestvideo[height<=720]+bestaudio/best[height<=720]',
-                '360': 'bestvideo[height<=360]+bestaudio/best[height<=360]',
-                'best': 'bestvideo+bestaudio/best',
-            }
-            ydl_opts = {
-                **base_opts,
-                'format': quality_map.get(quality, 'bestvideo+bestaudio/best'),
-                'merge_output_format': 'mp4',
-            }
+            pending[EXPAND_POOL.submit(cached_video_info, entry['url'])] = entry
+    for future in as_completed(pending):
+        meta = future.result()
+        if meta:
+            merge(pending[future], meta)
+    return entries
 
-        # optional subtitles
-        if include_subs:
-            ydl_opts['writesubtitles'] = True
-            ydl_opts['writeautomaticsub'] = True
-            if subs_langs:
-                # yt-dlp accepts comma-separated languages
-                ydl_opts['subtitleslangs'] = ','.join(subs_langs)
 
-        # concurrent fragments for faster downloads of segmented media
-        ydl_opts['concurrent_fragment_downloads'] = concurrent_fragments
+_FORMAT_ATOM_RE = re.compile(r'[^/+]+')
 
-        # Attempt download with UA rotation and retries to reduce chance of throttling/403
-        last_exc = None
-        for attempt in range(3):
-            ua = USER_AGENTS[attempt % len(USER_AGENTS)]
-            opts = dict(ydl_opts)
-            opts['http_headers'] = dict(ydl_opts.get('http_headers', {}))
-            opts['http_headers']['User-Agent'] = ua
+def limit_format_size(spec: str, limit: int) -> str:
+    """Restrict every format in a yt-dlp selector to (approximately) limit bytes.
 
-            try:
-                with yt_dlp.YoutubeDL(opts) as ydl:
-                    info = ydl.extract_info(url, download=True)
-                    file_path = ydl.prepare_filename(info)
+    Unknown sizes still pass (`<?`); merged video+audio is limited per stream.
+    """
+    return _FORMAT_ATOM_RE.sub(lambda m: f"{m.group(0)}[filesize<?{limit}][filesize_approx<?{limit}]", spec)
 
-                    if format_type == 'mp3':
-                        file_path = os.path.splitext(file_path)[0] + '.mp3'
-                    elif not file_path.endswith('.mp4') and format_type == 'mp4':
-                        file_path = os.path.splitext(file_path)[0] + '.mp4'
 
-                    return file_path, os.path.basename(file_path)
-            except Exception as e:
-                last_exc = e
-                logger.warning('Download attempt %d failed: %s', attempt + 1, repr(e))
-                time.sleep(2 + attempt * 2)
+def requested_format(fmt: str, quality: str) -> str:
+    """The yt-dlp format selector for fmt/quality, before the size limit is applied."""
+    if fmt == 'mp3':
+        return 'bestaudio/best'
+    return QUALITY_MAP.get(quality, QUALITY_MAP['best'])
 
-        # If we reach here, all attempts failed
-        if last_exc:
-            logger.error('Download error after retries: %s', repr(last_exc))
-            # If this looks like a 403/400, give actionable advice
-            err_text = repr(last_exc)
-            if 'HTTP Error 403' in err_text or 'HTTP Error 400' in err_text:
-                logger.error('HTTP 4xx error detected. Ensure yt-dlp is up-to-date (`pip install -U yt-dlp`) and consider placing a valid cookies.txt at %s for restricted content.', COOKIES_FILE)
 
-        return None
-    except Exception as e:
-        logger.exception('Unexpected download error: %s', repr(e))
-        return None
+def only_oversized_formats(url: str, opts: Dict, spec: str) -> bool:
+    """True if spec matches some format of url once the size limit is lifted.
+
+    Only asked after a size-limited download found no format, to tell "too big"
+    apart from "this quality doesn't exist"; costs one more extraction.
+    """
+    probe = dict(opts, format=spec)
+    probe.pop('postprocessors', None)
+    try:
+        with pooled_ydl(probe) as ydl:
+            ydl.extract_info(url, download=False)
+        return True
+    except Exception:
+        return False
 
 
+def build_download_opts(fmt: str, quality: str, include_subs: bool = False, subs_langs: Optional[list] = None) -> Dict:
+    """Build the yt-dlp options for one download; retries only swap the User-Agent."""
+    # Common headers and timeouts to avoid 403 errors
+    opts = {
+        'paths': {'home': str(DOWNLOADS_DIR), 'temp': str(TEMP_DIR)},
+        'outtmpl': '%(title)s.%(ext)s',
+        'socket_timeout': 30,
+        'continuedl': True,
+        'extractor_retries': 2,
+        'cachedir': str(YTDLP_CACHE_DIR),
+        'concurrent_fragment_downloads': CONCURRENT_FRAGMENTS,
+        'http_chunk_size': HTTP_CHUNK_SIZE,
+        # Only compared with each response's Content-Length, i.e. per
+        # http_chunk_size range: a backstop for the format filter below
+        'max_filesize': CONFIG['MAX_FILE_SIZE'],
+        'http_headers': {'Referer': 'https://www.youtube.com/'},
+    }
+
+    if USE_ARIA2:
+        opts['external_downloader'] = {'http': 'aria2c', 'https': 'aria2c'}
+        opts['external_downloader_args'] = {'aria2c': list(ARIA2_ARGS)}
+
+    if _cookies_present:
+        opts['cookiefile'] = _COOKIES_FILE_STR
+
+    # The size limit is enforced while choosing the format, before downloading
+    opts['format'] = limit_format_size(requested_format(fmt, quality), CONFIG['MAX_FILE_SIZE'])
+    if fmt == 'mp3':
+        opts['postprocessors'] = [dict(MP3_POSTPROCESSOR)]
+    else:
+        opts['merge_output_format'] = 'mp4'
+
+    # optional subtitles
+    if include_subs:
+        opts['writesubtitles'] = True
+        opts['writeautomaticsub'] = True
+        if subs_langs:
+            # yt-dlp accepts comma-separated languages
+            opts['subtitleslangs'] = ','.join(subs_langs)
+
+    return opts
+
+
+# yt-dlp calls the progress hook for every few KB downloaded; coalesce those
+# into at most one job update/event per PROGRESS_INTERVAL per job
+PROGRESS_INTERVAL = 0.25
+_LAST_PROGRESS = {}
+
 def _progress_hook(job_id, d):
     # d contains keys like status, downloaded_bytes, total_bytes, speed, eta
     try:
         status = d.get('status')
-        with JOBS_LOCK:
-            job = JOBS.get(job_id)
-            if not job:
+        now = time.monotonic()
+        if status == 'downloading':
+            if now - _LAST_PROGRESS.get(job_id, 0) < PROGRESS_INTERVAL:
                 return
-            if status == 'downloading':
-                downloaded = d.get('downloaded_bytes') or d.get('downloaded_bytes_estimate') or 0
-                total = d.get('total_bytes') or d.get('total_bytes_estimate') or 0
-                percent = None
-                if total:
-                    percent = int(downloaded / total * 100)
-                job['progress'] = percent if percent is not None else job.get('progress', 0)
-                job['speed'] = d.get('speed')
-                job['eta'] = d.get('eta')
-                job['status'] = 'running'
-            elif status == 'finished':
-                job['progress'] = 100
-                job['status'] = 'finalizing'
-            elif status == 'error':
-                job['status'] = 'error'
-                job['message'] = d.get('error')
-
-        # push event
-        push_event({'type': 'job_progress', 'job_id': job_id, 'data': job})
+            _LAST_PROGRESS[job_id] = now
+        else:
+            # Status transitions are always flushed
+            _LAST_PROGRESS.pop(job_id, None)
+
+        # Still alive: keep waiting jobs from taking the download over
+        lock_key = _JOB_LOCKS.get(job_id)
+        if lock_key:
+            singleflight_refresh(lock_key, job_id, DOWNLOAD_LOCK_TTL)
+
+        update = {}
+        if status == 'downloading':
+            downloaded = d.get('downloaded_bytes') or d.get('downloaded_bytes_estimate') or 0
+            total = d.get('total_bytes') or d.get('total_bytes_estimate') or 0
+            if total:
+                update['progress'] = int(downloaded / total * 100)
+            update['speed'] = d.get('speed')
+            update['eta'] = d.get('eta')
+            update['status'] = 'running'
+        elif status == 'finished':
+            update['progress'] = 100
+            update['status'] = 'finalizing'
+        elif status == 'error':
+            update['status'] = 'error'
+            update['message'] = d.get('error')
+
+        if not update or not update_job(job_id, **update):
+            return
+        if not has_subscribers():
+            return
+
+        # push event (clients merge the changed fields into their copy of the job)
+        push_event({'type': 'job_progress', 'job_id': job_id, 'data': update})
     except Exception as e:
         logger.debug('Progress hook error: %s', repr(e))
 
 
-def download_job(job_id: str):
-    """Process a single job using yt-dlp with progress hooks."""
-    with JOBS_LOCK:
-        job = JOBS.get(job_id)
-        if not job:
-            return
-        job['status'] = 'running'
+# Download locks expire unless the holder refreshes them (each attempt and
+# progress update), so a dead worker's lock is taken over by a waiting job
+DOWNLOAD_LOCK_TTL = 180
+_JOB_LOCKS: Dict[str, str] = {}  # job id -> download lock it holds
 
-    url = job['url']
-    fmt = job.get('format', 'mp4')
-    quality = job.get('quality', 'best')
+def download_flight_keys(url: str, fmt: str, quality: str, include_subs: bool = False) -> Tuple[str, str]:
+    """Return the (lock, result) keys shared by all jobs producing the same file."""
+    digest = cache_key('', f'{canonical_url(url)}|{fmt}|{quality}|{int(bool(include_subs))}')
+    return 'dl:lock:' + digest, 'dl:result:' + digest
 
-    out_tmpl = str(DOWNLOADS_DIR / '%(title)s.%(ext)s')
 
-    opts = {
-        'outtmpl': out_tmpl,
-        'socket_timeout': 30,
-        'continuedl': True,
-        'http_headers': {'Referer': 'https://www.youtube.com/'},
-        'progress_hooks': [lambda d: _progress_hook(job_id, d)],
+def existing_download(url: str, fmt: str, quality: str, include_subs: bool = False) -> Optional[str]:
+    """Return the filename of a previous identical download still on disk."""
+    _, result_key = download_flight_keys(url, fmt, quality, include_subs)
+    filename = cache_get(result_key)
+    if filename and (DOWNLOADS_DIR / filename).exists():
+        return filename
+    return None
+
+
+def create_job(url: str, fmt: str, quality: str, meta: Dict, include_subs: bool = False, subs_langs: Optional[list] = None) -> str:
+    """Register a new download job and announce it; returns the job id."""
+    job_id = str(uuid.uuid4())
+    job = {
+        'id': job_id,
+        'url': url,
+        'title': meta.get('title'),
+        'thumbnail_url': meta.get('thumbnail_url'),
+        'format': fmt,
+        'quality': quality,
+        'include_subs': include_subs,
+        'subs_langs': subs_langs,
+        'status': 'pending',
+        'progress': 0,
+        'speed': None,
+        'eta': None,
+        'filename': None,
+        'message': None,
+        'created_at': datetime.utcnow().isoformat()
     }
 
-    if COOKIES_FILE.exists():
-        opts['cookiefile'] = str(COOKIES_FILE)
+    # Identical download already on disk: complete the job without re-downloading
+    filename = existing_download(url, fmt, quality, include_subs)
+    if filename:
+        job.update({'status': 'completed', 'progress': 100, 'filename': filename})
+        job.update(_reused_file_details(job, filename))
 
-    if job.get('format_type') == 'mp3' or fmt == 'mp3':
-        opts.update({'format': 'bestaudio/best', 'postprocessors': [{
-            'key': 'FFmpegExtractAudio', 'preferredcodec': 'mp3', 'preferredquality': '192'}]})
+    save_job(job)
+    push_event({'type': 'job_enqueued', 'job_id': job_id, 'url': url})
+    if filename:
+        push_event({'type': 'job_done', 'job_id': job_id, 'file': filename})
     else:
-        quality_map = {
-            '1080': 'bestvideo[height<=1080]+bestaudio/best[height<=1080]',
-            '720': 'bestvideo[height<=720]+bestaudio/best[height<=720]',
-            '360': 'bestvideo[height<=360]+bestaudio/best[height<=360]',
-            'best': 'bestvideo+bestaudio/best',
-        }
-        opts.update({'format': quality_map.get(quality, 'bestvideo+bestaudio/best'), 'merge_output_format': 'mp4'})
+        submit_job(job_id)
+    return job_id
 
-    # subtitles
-    if job.get('include_subs'):
-        opts['writesubtitles'] = True
-        opts['writeautomaticsub'] = True
-        if job.get('subs_langs'):
-            opts['subtitleslangs'] = ','.join(job.get('subs_langs'))
 
-    # concurrent fragments for faster segmented downloads
-    opts['concurrent_fragment_downloads'] = int(os.environ.get('CONCURRENT_FRAGMENTS', '4'))
+def submit_job(job_id: str):
+    EXECUTOR.submit(_run_job, job_id)
+
+
+def _run_job(job_id: str):
+    try:
+        download_job(job_id)
+    except Exception as e:
+        logger.error('Worker error processing %s: %s', job_id, repr(e))
+
+
+def _reused_file_details(job: Dict, filename: str) -> Dict:
+    """What download_job records on completion, for a job reusing an existing file."""
+    details = {}
+    try:
+        size = os.stat(DOWNLOADS_DIR / filename).st_size
+        details.update(filesize=size, formatted_size=format_size(size))
+    except OSError:
+        pass  # removed by cleanup in the meantime; the size just stays unknown
+    # Playlist jobs are enqueued with shallow metadata; the cache may have more
+    if not job.get('title') or not job.get('thumbnail_url'):
+        meta = cached_meta(job['url']) or {}
+        if not job.get('title') and meta.get('title'):
+            details['title'] = meta['title']
+        if not job.get('thumbnail_url') and meta.get('thumbnail_url'):
+            details['thumbnail_url'] = meta['thumbnail_url']
+    return details
+
+
+def _complete_job(job_id: str, filename: str, **fields):
+    # Drop what a failed earlier attempt left behind ("retrying…" message etc.)
+    update_job(job_id, status='completed', progress=100, filename=filename,
+               message=None, speed=None, eta=None, **fields)
+    push_event({'type': 'job_done', 'job_id': job_id, 'file': filename})
+
+
+def _fail_job(job_id: str, exc: Exception):
+    update_job(job_id, status='failed', message=repr(exc))
+    push_event({'type': 'job_failed', 'job_id': job_id, 'error': repr(exc)})
+
+
+def download_job(job_id: str):
+    """Process a single job using yt-dlp with progress hooks."""
+    # Claim the job; a concurrent cancel (or a duplicate submit) wins otherwise
+    if not transition_job(job_id, ('pending', 'queued'), status='running'):
+        return
+    try:
+        _download_claimed_job(job_id)
+    except Exception as e:
+        # e.g. options that can't be built; don't leave the UI polling a "running" job
+        logger.exception('Job %s failed', job_id)
+        _fail_job(job_id, e)
+
+
+def _download_claimed_job(job_id: str):
+    job = load_job(job_id)
+
+    url = job['url']
+    fmt = job.get('format', 'mp4')
+    quality = job.get('quality', 'best')
+
+    opts = build_download_opts(fmt, quality, job.get('include_subs'), job.get('subs_langs'))
+
+    # Collapse concurrent jobs for the same file: one downloads, the rest wait for it
+    lock_key, result_key = download_flight_keys(url, fmt, quality, job.get('include_subs'))
+    filename = existing_download(url, fmt, quality, job.get('include_subs'))
+    if filename:
+        _complete_job(job_id, filename, **_reused_file_details(job, filename))
+        return
+    # Never download without the lock: wait for as long as the holder keeps it,
+    # then take it over if no file was published (the holder failed or died)
+    while not singleflight_acquire(lock_key, job_id, DOWNLOAD_LOCK_TTL):
+        filename = singleflight_wait(lock_key, result_key, DOWNLOAD_LOCK_TTL)
+        if filename and (DOWNLOADS_DIR / filename).exists():
+            _complete_job(job_id, filename, **_reused_file_details(job, filename))
+            return
+        if filename:
+            # Published file was cleaned up since; don't let it end the next wait early
+            cache_delete(result_key)
+    _JOB_LOCKS[job_id] = lock_key
 
     last_exc = None
-    for attempt in range(3):
-        ua = USER_AGENTS[attempt % len(USER_AGENTS)]
-        opts['http_headers']['User-Agent'] = ua
-        try:
-            with yt_dlp.YoutubeDL(opts) as ydl:
-                info = ydl.extract_info(url, download=True)
-                file_path = ydl.prepare_filename(info)
-                if fmt == 'mp3':
-                    file_path = os.path.splitext(file_path)[0] + '.mp3'
-                with JOBS_LOCK:
-                    JOBS[job_id]['status'] = 'completed'
-                    JOBS[job_id]['progress'] = 100
-                    JOBS[job_id]['filename'] = os.path.basename(file_path)
-                push_event({'type': 'job_done', 'job_id': job_id, 'file': JOBS[job_id]['filename']})
-                return
-        except Exception as e:
-            last_exc = e
-            logger.warning('Download attempt %d for job %s failed: %s', attempt + 1, job_id, repr(e))
-            with JOBS_LOCK:
-                JOBS[job_id]['status'] = 'retrying'
-                JOBS[job_id]['message'] = repr(e)
-            push_event({'type': 'job_retry', 'job_id': job_id, 'attempt': attempt + 1, 'error': repr(e)})
-            time.sleep(2 + attempt * 2)
+    try:
+        for attempt in range(3):
+            singleflight_refresh(lock_key, job_id, DOWNLOAD_LOCK_TTL)
+            opts['http_headers']['User-Agent'] = USER_AGENTS[attempt % len(USER_AGENTS)]
+            try:
+                with pooled_ydl(opts, job_id=job_id) as ydl:
+                    info = ydl.extract_info(url, download=True)
+                    file_path = final_file_path(ydl, info)
+                try:
+                    size = os.stat(file_path).st_size
+                except FileNotFoundError:
+                    expected = info.get('filesize') or info.get('filesize_approx')
+                    if expected and expected > CONFIG['MAX_FILE_SIZE']:
+                        # yt-dlp skips (without raising) formats over max_filesize
+                        last_exc = ValueError(f"File is larger than the {format_size(CONFIG['MAX_FILE_SIZE'])} limit")
+                        break
+                    raise
+            except Exception as e:
+                if isinstance(e, (yt_dlp.utils.DownloadError, yt_dlp.utils.ExtractorError)) and 'Requested format is not available' in str(e):
+                    # Nothing matched the selector; retrying won't help. Only blame
+                    # the size limit if the quality exists without it
+                    last_exc = e
+                    if only_oversized_formats(url, opts, requested_format(fmt, quality)):
+                        last_exc = ValueError(f"No format of the requested quality is within the {format_size(CONFIG['MAX_FILE_SIZE'])} limit")
+                    break
+                last_exc = e
+                logger.warning('Download attempt %d for job %s failed: %s', attempt + 1, job_id, repr(e))
+                update_job(job_id, status='retrying', message=repr(e))
+                push_event({'type': 'job_retry', 'job_id': job_id, 'attempt': attempt + 1, 'error': repr(e)})
+                time.sleep(2 + attempt * 2)
+                continue
+
+            # Completed outside the try so nothing after this can turn it into a retry
+            filename = os.path.basename(file_path)
+            cache_set(result_key, filename, CONFIG['FILE_RETENTION_HOURS'] * 3600)
+            details = {'filesize': size, 'formatted_size': format_size(size)}
+            # Playlist jobs are enqueued with shallow metadata; fill it in now
+            if not job.get('title'):
+                details['title'] = info.get('title')
+            if not job.get('thumbnail_url'):
+                details['thumbnail_url'] = info.get('thumbnail')
+            _complete_job(job_id, filename, **details)
+            return
+    finally:
+        _LAST_PROGRESS.pop(job_id, None)
+        _JOB_LOCKS.pop(job_id, None)
+        singleflight_release(lock_key, job_id)
 
     # all attempts exhausted
-    with JOBS_LOCK:
-        JOBS[job_id]['status'] = 'failed'
-        JOBS[job_id]['message'] = repr(last_exc)
-    push_event({'type': 'job_failed', 'job_id': job_id, 'error': repr(last_exc)})
+    _fail_job(job_id, last_exc)
+
+
+def resume_pending_jobs():
+    """Resubmit jobs that were waiting when the process last stopped."""
+    # Every gunicorn worker imports the app; only the first one to boot resumes
+    if not singleflight_acquire('ytdl:resume', str(os.getpid()), 60):
+        return
+    pending = [j['id'] for j in load_jobs() if j.get('status') in ('pending', 'queued')]
+    for jid in pending:
+        submit_job(jid)
+    if pending:
+        logger.info('Resubmitted %d pending jobs', len(pending))
+
+
+def cleanup_old_files():
+    """Delete downloads and leftover temp files older than FILE_RETENTION_HOURS."""
+    cutoff = time.time() - CONFIG['FILE_RETENTION_HOURS'] * 3600
+    removed = 0
+    for directory in (DOWNLOADS_DIR, TEMP_DIR):
+        # scandir gets the file type from the directory listing itself
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_file(follow_symlinks=False) and entry.stat().st_mtime < cutoff:
+                        os.unlink(entry.path)
+                        removed += 1
+                except OSError as e:
+                    logger.warning('Failed to remove %s: %s', entry.path, repr(e))
+    if removed:
+        logger.info('Cleanup removed %d old files', removed)
 
 
-def worker_loop():
-    logger.info('Background worker started')
+def _cleanup_loop():
     while True:
-        job_to_process = None
-        with JOBS_LOCK:
-            for jid, j in JOBS.items():
-                if j.get('status') == 'pending':
-                    job_to_process = jid
-                    j['status'] = 'queued'
-                    break
-
-        if job_to_process:
+        # Workers sharing Redis take turns: the lock expires after one interval
+        if redis_client is None or singleflight_acquire('ytdl:cleanup', str(os.getpid()), CONFIG['CLEANUP_INTERVAL']):
             try:
-                download_job(job_to_process)
+                cleanup_old_files()
             except Exception as e:
-                logger.error('Worker error processing %s: %s', job_to_process, repr(e))
-        else:
-            time.sleep(1)
+                logger.error('Cleanup failed: %s', repr(e))
+        time.sleep(CONFIG['CLEANUP_INTERVAL'])
 
 
-# Start background worker thread
-worker_thread = threading.Thread(target=worker_loop, daemon=True)
-worker_thread.start()
+def start_background_tasks():
+    resume_pending_jobs()
+    threading.Thread(target=_cleanup_loop, name='cleanup', daemon=True).start()
+
+
+# When started as a script, __main__ decides below which process owns the jobs
+if __name__ != '__main__':
+    start_background_tasks()
 
 
 # ---------- Cookies management API ----------
@@ -444,6 +1233,7 @@ def cookies_status():
 @app.route('/api/upload-cookies', methods=['POST'])
 def upload_cookies():
     """Upload a cookies.txt (Netscape format). Field name: 'cookies' or 'file'."""
+    global _cookies_present
     if 'cookies' in request.files:
         f = request.files['cookies']
     elif 'file' in request.files:
@@ -458,7 +1248,9 @@ def upload_cookies():
 
     try:
         # Save to the canonical cookies path used by the downloader
-        f.save(str(COOKIES_FILE))
+        f.save(_COOKIES_FILE_STR)
+        _cookies_present = True
+        clear_ydl_pool()
         logger.info('Saved cookies to %s', COOKIES_FILE)
         return jsonify({'success': True, 'message': 'Cookies uploaded'}), 201
     except Exception as e:
@@ -468,9 +1260,12 @@ def upload_cookies():
 
 @app.route('/api/cookies', methods=['DELETE'])
 def delete_cookies():
+    global _cookies_present
     try:
         if COOKIES_FILE.exists():
             COOKIES_FILE.unlink()
+            _cookies_present = False
+            clear_ydl_pool()
             return jsonify({'success': True, 'message': 'Cookies deleted'})
         return jsonify({'success': False, 'error': 'No cookies present'}), 404
     except Exception as e:
@@ -478,40 +1273,40 @@ def delete_cookies():
         return jsonify({'success': False, 'error': 'Failed to delete cookies'}), 500
 
 
+# ---------- Admin API ----------
+# Disabled unless ADMIN_TOKEN is set; callers send it as X-Admin-Token
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
+@app.route('/api/admin/meta-cache', methods=['DELETE'])
+def clear_meta_cache():
+    """Drop this worker's in-memory metadata tier (the shared cache is kept)."""
+    if not ADMIN_TOKEN or request.headers.get('X-Admin-Token') != ADMIN_TOKEN:
+        return jsonify({'success': False, 'error': 'Forbidden'}), 403
+    forget_hot_video_info()
+    return jsonify({'success': True, 'message': 'Metadata cache cleared'})
+
+
 # ---------------- Queue API & Events ----------------
 @app.route('/api/queue', methods=['POST'])
 def enqueue():
-    data = request.get_json() or {}
+    try:
+        data = fast_loads(request.get_data() or b'{}')
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Invalid JSON body'}), 400
+    if not isinstance(data, dict):
+        data = {}
 
     # Bulk enqueue: accept 'items' list where each item is {url, format?, quality?}
     items = data.get('items')
     created = []
     if items and isinstance(items, list):
-        for it in items:
-            url = it.get('url')
-            if not url or not validate_youtube_url(url):
-                continue
+        valid = [it for it in items if isinstance(it, dict) and validate_youtube_url(it.get('url'))]
+        metas = cached_video_infos([it['url'] for it in valid])
+        for it, meta in zip(valid, metas):
+            url = it['url']
             fmt = it.get('format', data.get('format', 'mp4'))
             quality = it.get('quality', data.get('quality', 'best'))
-            meta = get_video_info_from_yt_dlp(url) or {}
-            job_id = str(uuid.uuid4())
-            with JOBS_LOCK:
-                JOBS[job_id] = {
-                    'id': job_id,
-                    'url': url,
-                    'title': meta.get('title'),
-                    'thumbnail_url': meta.get('thumbnail_url'),
-                    'format': fmt,
-                    'quality': quality,
-                    'status': 'pending',
-                    'progress': 0,
-                    'speed': None,
-                    'eta': None,
-                    'filename': None,
-                    'message': None,
-                    'created_at': datetime.utcnow().isoformat()
-                }
-            push_event({'type': 'job_enqueued', 'job_id': job_id, 'url': url})
+            job_id = create_job(url, fmt, quality, meta or {})
             created.append(job_id)
 
         if created:
@@ -538,42 +1333,18 @@ def enqueue():
     if expand:
         try:
             logger.info('Expanding playlist/channel for URL: %s', url)
-            with yt_dlp.YoutubeDL({'quiet': True, 'skip_download': True}) as ydl:
-                info = ydl.extract_info(url, download=False)
-            entries = info.get('entries') or []
+            entries = get_playlist_entries(url, int(os.environ.get('MAX_PLAYLIST_ITEMS', '200')))
             created_ids = []
-            max_items = int(os.environ.get('MAX_PLAYLIST_ITEMS', '200'))
-            count = 0
             for entry in entries:
-                if count >= max_items:
-                    break
-                entry_url = entry.get('webpage_url') or entry.get('url')
+                entry_url = entry.get('url')
                 if not entry_url:
                     continue
                 meta = {
                     'title': entry.get('title'),
                     'thumbnail_url': entry.get('thumbnail'),
                 }
-                job_id = str(uuid.uuid4())
-                with JOBS_LOCK:
-                    JOBS[job_id] = {
-                        'id': job_id,
-                        'url': entry_url,
-                        'title': meta.get('title'),
-                        'thumbnail_url': meta.get('thumbnail_url'),
-                        'format': fmt,
-                        'quality': quality,
-                        'status': 'pending',
-                        'progress': 0,
-                        'speed': None,
-                        'eta': None,
-                        'filename': None,
-                        'message': None,
-                        'created_at': datetime.utcnow().isoformat()
-                    }
-                push_event({'type': 'job_enqueued', 'job_id': job_id, 'url': entry_url})
+                job_id = create_job(entry_url, fmt, quality, meta)
                 created_ids.append(job_id)
-                count += 1
 
             if created_ids:
                 return jsonify({'success': True, 'job_ids': created_ids, 'count': len(created_ids)}), 201
@@ -582,65 +1353,119 @@ def enqueue():
             logger.exception('Playlist expansion failed for %s', url)
             return jsonify({'success': False, 'error': 'Playlist expansion failed', 'detail': str(e)}), 500
 
-    meta = get_video_info_from_yt_dlp(url) or {}
-    job_id = str(uuid.uuid4())
-    with JOBS_LOCK:
-        JOBS[job_id] = {
-            'id': job_id,
-            'url': url,
-            'title': meta.get('title'),
-            'thumbnail_url': meta.get('thumbnail_url'),
-            'format': fmt,
-            'quality': quality,
-            'include_subs': include_subs,
-            'subs_langs': subs_langs,
-            'status': 'pending',
-            'progress': 0,
-            'speed': None,
-            'eta': None,
-            'filename': None,
-            'message': None,
-            'created_at': datetime.utcnow().isoformat()
-        }
-
-    push_event({'type': 'job_enqueued', 'job_id': job_id, 'url': url})
+    meta = cached_video_info(url) or {}
+    job_id = create_job(url, fmt, quality, meta, include_subs=include_subs, subs_langs=subs_langs)
     return jsonify({'success': True, 'job_id': job_id}), 201
 
 
 @app.route('/api/queue', methods=['GET'])
 def list_jobs():
-    with JOBS_LOCK:
-        return jsonify({'jobs': list(JOBS.values())})
+    return jsonify({'jobs': load_jobs()})
 
 
 @app.route('/api/queue/<job_id>', methods=['GET'])
+@limiter.exempt  # cheap job-store read that the UI polls for the whole download
 def get_job(job_id):
-    with JOBS_LOCK:
-        job = JOBS.get(job_id)
-        if not job:
-            return jsonify({'success': False, 'error': 'Not found'}), 404
-        return jsonify({'success': True, 'job': job})
+    job = load_job(job_id)
+    if not job:
+        return jsonify({'success': False, 'error': 'Not found'}), 404
+    return jsonify({'success': True, 'job': job})
 
 
 @app.route('/api/stream')
 def stream_events():
-    def event_stream():
-        while True:
-            try:
-                ev = EVENT_QUEUE.get()
-                data = json.dumps(ev)
-                yield f"data: {data}\n\n"
-            except GeneratorExit:
-                break
-            except Exception:
-                time.sleep(0.5)
+    try:
+        last_id = int(request.headers.get('Last-Event-ID', ''))
+    except ValueError:
+        last_id = None
 
-    return app.response_class(event_stream(), mimetype='text/event-stream')
+    def redis_stream():
+        pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(EVENT_CHANNEL)
+        try:
+            # Subscribed before reading the ring, so nothing falls in between;
+            # live frames already replayed are skipped by id
+            seen = last_id
+            if last_id is not None:
+                missed = [f for f in reversed(redis_client.lrange(EVENT_RING_KEY, 0, -1)) if _frame_id(f) > last_id]
+                if missed:
+                    seen = _frame_id(missed[-1])
+                    yield b''.join(missed)
+
+            def is_new(msg) -> bool:
+                return (msg is not None and msg['type'] == 'message'
+                        and (seen is None or _frame_id(msg['data']) > seen))
+
+            idle_since = time.monotonic()
+            while True:
+                # Returns None on timeout and for (ignored) subscribe confirmations
+                msg = pubsub.get_message(timeout=HEARTBEAT_INTERVAL)
+                if is_new(msg):
+                    batch = [msg['data']]
+                    deadline = time.monotonic() + SSE_BATCH_WINDOW
+                    while len(batch) < SSE_BATCH_MAX:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        msg = pubsub.get_message(timeout=remaining)
+                        if is_new(msg):
+                            batch.append(msg['data'])
+                    idle_since = time.monotonic()
+                    yield b''.join(batch)
+                elif time.monotonic() - idle_since >= HEARTBEAT_INTERVAL:
+                    idle_since = time.monotonic()
+                    yield HEARTBEAT_FRAME
+        finally:
+            pubsub.close()
+
+    def local_stream():
+        q = _queue.Queue(maxsize=1000)
+        with SUBSCRIBERS_LOCK:
+            SUBSCRIBERS.append(q)
+            missed = [f for f in EVENT_RING if _frame_id(f) > last_id] if last_id is not None else []
+        try:
+            if missed:
+                yield b''.join(missed)
+            while True:
+                try:
+                    batch = [q.get(timeout=HEARTBEAT_INTERVAL)]
+                except _queue.Empty:
+                    yield HEARTBEAT_FRAME
+                    continue
+                deadline = time.monotonic() + SSE_BATCH_WINDOW
+                while len(batch) < SSE_BATCH_MAX:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(q.get(timeout=remaining))
+                    except _queue.Empty:
+                        break
+                yield b''.join(batch)
+        finally:
+            with SUBSCRIBERS_LOCK:
+                SUBSCRIBERS.remove(q)
+
+    stream = redis_stream() if redis_client is not None else local_stream()
+    return app.response_class(stream, mimetype='text/event-stream')
 
 # ============================================================================
 # API Routes
 # ============================================================================
 
+def force_refresh_requested(data: Dict) -> bool:
+    """True if the caller asked to bypass the metadata cache (?force_refresh=1 or body flag)."""
+    flag = request.args.get('force_refresh', data.get('force_refresh', ''))
+    return str(flag).lower() in ('1', 'true', 'yes')
+
+
+@app.route('/api/health', methods=['GET'])
+@limiter.exempt  # polled every 30s by the Docker healthcheck
+def health():
+    """Liveness probe for Docker/nginx; never touches yt-dlp."""
+    return jsonify({'success': True, 'status': 'ok', 'timestamp': datetime.utcnow().isoformat()})
+
+
 @app.route('/api/video-info', methods=['POST'])
 def get_video_info():
     data = request.get_json()
@@ -648,12 +1473,35 @@ def get_video_info():
     if not url or not validate_youtube_url(url):
         return jsonify({'success': False, 'error': 'Invalid URL'}), 400
     
-    info = get_video_info_from_yt_dlp(url)
+    info = cached_video_info(url, force_refresh=force_refresh_requested(data))
     if info:
         return jsonify({'success': True, 'data': info})
     return jsonify({'success': False, 'error': 'Video unavailable'}), 404
 
 
+@app.route('/api/video-info/batch', methods=['POST'])
+def get_video_info_batch():
+    """Validate several URLs in one round trip; fetch metadata via /api/video-info."""
+    data = request.get_json(silent=True)
+    urls = data.get('urls') if isinstance(data, dict) else None
+    if not isinstance(urls, list) or not urls:
+        return jsonify({'success': False, 'error': 'Expected a non-empty "urls" list'}), 400
+    max_items = int(os.environ.get('MAX_PLAYLIST_ITEMS', '200'))
+    if len(urls) > max_items:
+        return jsonify({'success': False, 'error': f'At most {max_items} URLs per batch'}), 400
+
+    # Validation only: one rate-limited request must not fan out into
+    # hundreds of extractions
+    results = []
+    for url in urls:
+        url = url.strip() if isinstance(url, str) else ''
+        if url and validate_youtube_url(url):
+            results.append({'url': url, 'valid': True})
+        else:
+            results.append({'url': url, 'valid': False, 'error': 'Invalid URL'})
+    return jsonify({'success': True, 'results': results})
+
+
 @app.route('/api/expand', methods=['POST'])
 def expand_playlist():
     data = request.get_json() or {}
@@ -662,45 +1510,38 @@ def expand_playlist():
         return jsonify({'success': False, 'error': 'Invalid URL'}), 400
 
     try:
-        with yt_dlp.YoutubeDL({'quiet': True, 'skip_download': True}) as ydl:
-            info = ydl.extract_info(url, download=False)
-        entries = info.get('entries') or []
         max_items = int(os.environ.get('MAX_PLAYLIST_ITEMS', '200'))
-        result = []
-        count = 0
-        for e in entries:
-            if count >= max_items:
-                break
-            result.append({
-                'title': e.get('title'),
-                'url': e.get('webpage_url') or e.get('url'),
-                'thumbnail': e.get('thumbnail'),
-                'duration': e.get('duration')
-            })
-            count += 1
-        return jsonify({'success': True, 'entries': result})
+        entries = get_playlist_entries(url, max_items, force_refresh=force_refresh_requested(data))
+        # The flat listing is one request; full per-video metadata is opt-in
+        if data.get('enrich'):
+            entries = enrich_entries(entries)
+        return jsonify({'success': True, 'entries': entries})
     except Exception as e:
         logger.exception('Expand error')
         return jsonify({'success': False, 'error': 'Failed to expand playlist', 'detail': str(e)}), 500
 
 @app.route('/api/download', methods=['POST'])
 def download_video():
-    data = request.get_json()
+    """Queue a download and return at once; poll /api/queue/<job_id> for the file."""
+    data = request.get_json() or {}
     url = data.get('url')
+    if not url or not validate_youtube_url(url):
+        return jsonify({'success': False, 'error': 'Invalid URL'}), 400
     fmt = data.get('format', 'mp4')
     quality = data.get('quality', 'best')
     include_subs = bool(data.get('include_subs'))
     subs_langs = data.get('subs_langs') or None
 
-    result = download_video_with_yt_dlp(url, fmt, quality, include_subs=include_subs, subs_langs=subs_langs)
-    if result:
-        file_path, filename = result
-        return jsonify({
-            'success': True,
-            'download_url': f"/api/file/{filename}",
-            'filename': filename
-        })
-    return jsonify({'success': False, 'error': 'Download failed'}), 500
+    # Don't wait on YouTube here: the worker fills in title/thumbnail if uncached
+    meta = cached_meta(url) or {}
+    job_id = create_job(url, fmt, quality, meta, include_subs=include_subs, subs_langs=subs_langs)
+    job = load_job(job_id) or {}
+    return jsonify({
+        'success': True,
+        'job_id': job_id,
+        'status': job.get('status', 'pending'),
+        'status_url': f"/api/queue/{job_id}",
+    }), 202
 
 
 @app.route('/api/subtitles', methods=['POST'])
@@ -711,16 +1552,10 @@ def list_subtitles():
         return jsonify({'success': False, 'error': 'Invalid URL'}), 400
 
     try:
-        with yt_dlp.YoutubeDL({'quiet': True, 'skip_download': True}) as ydl:
+        with pooled_ydl({'quiet': True, 'skip_download': True, 'cachedir': str(YTDLP_CACHE_DIR)}) as ydl:
             info = ydl.extract_info(url, download=False)
 
-        subs = {}
-        for k, v in (info.get('subtitles') or {}).items():
-            subs[k] = {'manual': True}
-        for k, v in (info.get('automatic_captions') or {}).items():
-            subs.setdefault(k, {})['automatic'] = True
-
-        return jsonify({'success': True, 'subtitles': subs})
+        return jsonify({'success': True, 'subtitles': subtitle_languages(info)})
     except Exception as e:
         logger.exception('Subtitles listing failed')
         return jsonify({'success': False, 'error': 'Failed to list subtitles', 'detail': str(e)}), 500
@@ -735,12 +1570,13 @@ def download_subtitles():
         return jsonify({'success': False, 'error': 'Missing url or lang'}), 400
 
     out_tmpl = str(DOWNLOADS_DIR / '%(title)s.%(ext)s')
-    opts = {'outtmpl': out_tmpl, 'skip_download': True, 'writesubtitles': True, 'subtitlesformat': 'vtt', 'subtitleslangs': lang}
-    if COOKIES_FILE.exists():
-        opts['cookiefile'] = str(COOKIES_FILE)
+    opts = {'outtmpl': out_tmpl, 'skip_download': True, 'writesubtitles': True, 'subtitlesformat': 'vtt', 'subtitleslangs': lang,
+            'cachedir': str(YTDLP_CACHE_DIR)}
+    if _cookies_present:
+        opts['cookiefile'] = _COOKIES_FILE_STR
 
     try:
-        with yt_dlp.YoutubeDL(opts) as ydl:
+        with pooled_ydl(opts) as ydl:
             info = ydl.extract_info(url, download=True)
             # yt-dlp will write subtitle file next to output; try to locate it
             filename = ydl.prepare_filename(info)
@@ -757,21 +1593,47 @@ def download_subtitles():
 
 @app.route('/api/queue/<job_id>/cancel', methods=['POST'])
 def cancel_job(job_id):
-    with JOBS_LOCK:
-        job = JOBS.get(job_id)
-        if not job:
-            return jsonify({'success': False, 'error': 'Not found'}), 404
-        if job.get('status') in ('pending', 'queued'):
-            job['status'] = 'cancelled'
-            push_event({'type': 'job_cancelled', 'job_id': job_id})
-            return jsonify({'success': True, 'job_id': job_id})
-        return jsonify({'success': False, 'error': 'Cannot cancel running or completed job'}), 400
+    cancelled = transition_job(job_id, ('pending', 'queued'), status='cancelled')
+    if cancelled is None:
+        return jsonify({'success': False, 'error': 'Not found'}), 404
+    if cancelled:
+        push_event({'type': 'job_cancelled', 'job_id': job_id})
+        return jsonify({'success': True, 'job_id': job_id})
+    return jsonify({'success': False, 'error': 'Cannot cancel running or completed job'}), 400
 
 @app.route('/api/file/<filename>')
 def serve_file(filename):
     if not is_safe_filename(filename):
         return "Invalid filename", 400
-    return send_file(DOWNLOADS_DIR / filename, as_attachment=True)
+
+    file_path = DOWNLOADS_DIR / filename
+    if not file_path.is_file():
+        return "Not Found", 404
+
+    if X_ACCEL_PREFIX and request.headers.get('X-Sendfile-Type') == 'X-Accel-Redirect':
+        resp = make_response('')
+        resp.headers['X-Accel-Redirect'] = X_ACCEL_PREFIX + quote(filename)
+        resp.headers['Content-Type'] = 'application/octet-stream'
+        resp.headers['Content-Disposition'] = _content_disposition(filename)
+        return resp
+
+    # send_file hands the open file to wsgi.file_wrapper, which gunicorn turns
+    # into sendfile(2); conditional=True answers Range/If-Range with 206
+    resp = send_file(file_path, as_attachment=True, conditional=True)
+    # Werkzeug only advertises ranges on 206s; say so up front so download
+    # managers and browsers know they can resume or split the transfer
+    resp.headers.setdefault('Accept-Ranges', 'bytes')
+    return resp
+
+
+def _content_disposition(filename: str) -> str:
+    try:
+        filename.encode('ascii')
+        return f'attachment; filename="{filename}"'
+    except UnicodeEncodeError:
+        # RFC 6266: ASCII fallback plus the UTF-8 name for modern browsers
+        simple = unicodedata.normalize('NFKD', filename).encode('ascii', 'ignore').decode('ascii')
+        return f"attachment; filename=\"{simple}\"; filename*=UTF-8''{quote(filename)}"
 
 
 # Serve frontend static files (index, app.js, favicon, etc.) when present
@@ -807,7 +1669,15 @@ if __name__ == '__main__':
     bind_info = f"{host}:{port}"
     logger.info(f"Starting server on http://{bind_info} (debug={debug})")
 
-    if HAS_WAITRESS:
+    # gunicorn only runs on POSIX; Windows falls back to waitress
+    if os.name == 'posix' and not debug and shutil.which('gunicorn'):
+        # Re-exec as `gunicorn -c gunicorn.conf.py app:app` so gevent can patch
+        # before the app is imported; the workers own the jobs, not this process
+        os.execvp('gunicorn', ['gunicorn', '-c', str(BASE_DIR / 'gunicorn.conf.py'), '--chdir', str(BASE_DIR),
+                               '--bind', bind_info, 'app:app'])
+    elif HAS_WAITRESS:
+        start_background_tasks()
         serve(app, host=host, port=port)
     else:
+        start_background_tasks()
         app.run(host=host, port=port, debug=debug)
\ No newline at end of file
@@ -0,0 +1,34 @@
+"""
+Gunicorn configuration for the YouTube Video Downloader backend
+Usage (from backend directory): gunicorn -c gunicorn.conf.py app:app
+"""
+
+import os
+
+bind = f"{os.environ.get('HOST', '0.0.0.0')}:{os.environ.get('PORT', '5000')}"
+
+# gevent workers serve each SSE client (/api/stream) from a cheap greenlet
+# instead of pinning a whole OS thread per connected browser.
+# GUNICORN_WORKER_CLASS=gthread is the alternative when gevent isn't wanted;
+# each request then holds one of `threads` threads (SSE clients included).
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gevent')
+worker_connections = int(os.environ.get('WORKER_CONNECTIONS', '1000'))
+threads = int(os.environ.get('GUNICORN_THREADS', '8'))
+
+# Job state and SSE events live in process memory unless REDIS_URL is set,
+# so only scale out (one worker per CPU) when they can share Redis.
+workers = int(os.environ.get('WEB_WORKERS', str(os.cpu_count() or 1) if os.environ.get('REDIS_URL') else '1'))
+
+timeout = 120
+
+# Recycling workers also kills the downloads running in their thread pool, so
+# it is opt-in (e.g. MAX_REQUESTS=1000). No preload either: each worker must
+# import the app itself to start its own download pool and background tasks.
+max_requests = int(os.environ.get('MAX_REQUESTS', '0'))
+max_requests_jitter = int(os.environ.get('MAX_REQUESTS_JITTER', '100'))
+
+# /api/file responses go through wsgi.file_wrapper; let the kernel copy them
+sendfile = True
+accesslog = '-'
+errorlog = '-'
+loglevel = 'info'
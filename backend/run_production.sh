@@ -10,16 +10,8 @@ cd "$(dirname "$0")"
 echo "📦 Installing dependencies..."
 pip install -r requirements.txt
 
-# Run with Gunicorn (production-ready WSGI server)
+# Run with Gunicorn (production-ready WSGI server, gevent workers)
 echo "✓ Starting Gunicorn server on 0.0.0.0:5000..."
-gunicorn \
-    --workers 4 \
-    --worker-class sync \
-    --bind 0.0.0.0:5000 \
-    --timeout 120 \
-    --access-logfile - \
-    --error-logfile - \
-    --log-level info \
-    app:app
+gunicorn -c gunicorn.conf.py app:app
 
 echo "Server stopped."
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Single entry point for the backend.
+
+    python server.py --mode prod      # gunicorn (POSIX) or waitress
+    python server.py --mode dev       # Flask development server
+    python server.py --mode debug     # development server with the debugger
+    python server.py --mode minimal   # /api/health only, skips importing app/yt-dlp
+"""
+
+import argparse
+import os
+import shutil
+import socket
+import sys
+import traceback
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent
+
+
+def run_prod(host: str, port: int):
+    if os.name == 'posix' and shutil.which('gunicorn'):
+        # Exec before importing the app so this process never starts jobs itself
+        os.execvp('gunicorn', ['gunicorn', '-c', str(BASE_DIR / 'gunicorn.conf.py'), '--chdir', str(BASE_DIR),
+                               '--bind', f"{host}:{port}", 'app:app'])
+
+    from app import app  # starts the background tasks on import
+    try:
+        from waitress import serve
+    except ImportError:
+        print('waitress is not installed; falling back to the stdlib wsgiref server', file=sys.stderr)
+        run_wsgiref(app, host, port)
+        return
+
+    serve(app, host=host, port=port, threads=int(os.environ.get('THREADS', '10')),
+          connection_limit=int(os.environ.get('CONNECTION_LIMIT', '200')), channel_timeout=600)
+
+
+def run_wsgiref(app, host: str, port: int):
+    from socketserver import ThreadingMixIn
+    from wsgiref.simple_server import WSGIServer, make_server
+
+    class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+        # One thread per request, so a slow /api/video-info doesn't block the rest
+        daemon_threads = True
+        # The default backlog of 5 refuses connections under a burst. wsgiref
+        # still closes every connection after one response (no keep-alive);
+        # install waitress when that matters.
+        request_queue_size = 128
+
+        def server_bind(self):
+            self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            super().server_bind()
+
+    with make_server(host, port, app, server_class=ThreadingWSGIServer) as httpd:
+        httpd.serve_forever()
+
+
+def run_dev(host: str, port: int, debug: bool = False):
+    from app import app
+    app.run(host=host, port=port, debug=debug, threaded=True, use_reloader=False)
+
+
+def run_minimal(host: str, port: int):
+    from flask import Flask, jsonify
+
+    app = Flask(__name__)
+
+    @app.route('/api/health', methods=['GET'])
+    def health():
+        return jsonify({'success': True, 'status': 'ok', 'message': 'Minimal backend is running'})
+
+    app.run(host=host, port=port, threaded=True, use_reloader=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the YouTube Video Downloader backend')
+    parser.add_argument('--mode', choices=('prod', 'dev', 'debug', 'minimal'), default='dev')
+    parser.add_argument('--host', default=os.environ.get('HOST', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', '8001')))
+    args = parser.parse_args(argv)
+
+    print(f"Starting backend ({args.mode}) on http://{args.host}:{args.port}")
+    sys.stdout.flush()
+
+    try:
+        if args.mode == 'prod':
+            run_prod(args.host, args.port)
+        elif args.mode == 'minimal':
+            run_minimal(args.host, args.port)
+        else:
+            run_dev(args.host, args.port, debug=args.mode == 'debug')
+    except OSError as e:
+        # Usually the port is taken or the host cannot be bound
+        print(f"Socket error: {e}", file=sys.stderr)
+        traceback.print_exc()
+        sys.exit(1)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
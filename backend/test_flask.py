@@ -1,5 +1,11 @@
 #!/usr/bin/env python3
-"""Simple test Flask app to verify Flask can bind to port 5000"""
+"""Simple test Flask app to verify Flask can bind to port 5000
+
+For anything beyond a bind check use the real server: python server.py --mode prod
+"""
+
+import logging
+import os
 
 from flask import Flask
 
@@ -10,5 +16,14 @@ def test():
     return {'status': 'ok'}
 
 if __name__ == '__main__':
+    # Per-request access logging would otherwise write to stderr under a lock
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+    # Fork a process pool where possible (Linux/macOS); Windows gets threads
+    if hasattr(os, 'fork'):
+        concurrency = {'processes': os.cpu_count() or 1}
+    else:
+        concurrency = {'threaded': True}
+
     print("Starting test Flask app on 0.0.0.0:5000...")
-    app.run(host='0.0.0.0', port=5000, debug=False, threaded=True)
+    app.run(host='0.0.0.0', port=5000, debug=False, use_reloader=False, **concurrency)
@@ -398,6 +398,38 @@ async function fetchVideoInfo(url) {
     }
 }
 
+/**
+ * Poll a queued job until it finishes, mirroring its progress on the download button
+ */
+async function waitForJob(jobId) {
+    // Poll quickly while progress moves, backing off to 5s while it doesn't
+    let delay = 1000;
+    let lastProgress = -1;
+    while (true) {
+        const res = await fetch(`${CONFIG.API_BASE_URL}/queue/${jobId}`);
+        if (!res.ok) throw new Error('Download failed');
+        const { job } = await res.json();
+
+        if (job.status === 'completed') {
+            return {
+                success: true,
+                filename: job.filename,
+                download_url: `${CONFIG.API_BASE_URL}/file/${encodeURIComponent(job.filename)}`,
+            };
+        }
+        if (job.status === 'failed' || job.status === 'cancelled') {
+            return { success: false, error: job.message || `Download ${job.status}` };
+        }
+
+        const percent = job.progress || 0;
+        elements.progressBar.style.width = `${percent}%`;
+        elements.downloadBtnText.textContent = `Downloading... ${Math.round(percent)}%`;
+        delay = percent === lastProgress ? Math.min(delay * 1.5, 5000) : 1000;
+        lastProgress = percent;
+        await new Promise(resolve => setTimeout(resolve, delay));
+    }
+}
+
 /**
  * Download video with selected options
  */
@@ -435,7 +467,13 @@ async function downloadVideo() {
             throw new Error(errorData.error || 'Download failed');
         }
 
-        const data = await response.json();
+        const queued = await response.json();
+        if (!queued.success || !queued.job_id) {
+            throw new Error(queued.error || 'Download failed');
+        }
+
+        // The server queues the download (202); poll the job until the file is ready
+        const data = await waitForJob(queued.job_id);
 
         if (data.success && data.download_url) {
             // Initiate download